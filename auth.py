@@ -0,0 +1,64 @@
+from flask import Blueprint, render_template, request, redirect, url_for, session
+from models import db, User, Purchase, Rental, RepairRequest, SellBack, Donation
+
+bp = Blueprint('auth', __name__)
+
+def get_user():
+    email = session.get('user_email')
+    if email:
+        return User.query.filter_by(email=email).first()
+    return None
+
+PROFILE_PAGE_SIZE = 20
+
+def history_page(model, user, page):
+    return (model.query.filter_by(user_id=user.id).order_by(model.id.desc())
+            .paginate(page=page, per_page=PROFILE_PAGE_SIZE, error_out=False))
+
+@bp.route('/profile', methods=['GET', 'POST'])
+def profile():
+    user = get_user()
+    if not user:
+        return redirect(url_for('auth.login'))
+    pages = {
+        'purchases': history_page(Purchase, user, request.args.get('purchases_page', 1, type=int)),
+        'repairs': history_page(RepairRequest, user, request.args.get('repairs_page', 1, type=int)),
+        'sell_backs': history_page(SellBack, user, request.args.get('sell_backs_page', 1, type=int)),
+        'rentals': history_page(Rental, user, request.args.get('rentals_page', 1, type=int)),
+        'donations': history_page(Donation, user, request.args.get('donations_page', 1, type=int)),
+    }
+    return render_template('profile.html', user={'name': user.name, 'email': user.email, 'points': user.points}, pages=pages,
+                           purchases=pages['purchases'].items, repairs=pages['repairs'].items, sell_backs=pages['sell_backs'].items,
+                           rentals=pages['rentals'].items, donations=pages['donations'].items)
+
+@bp.route('/register', methods=['GET', 'POST'])
+def register():
+    if request.method == 'POST':
+        name = request.form.get('name')
+        email = request.form.get('email')
+        password = request.form.get('password')
+        if User.query.filter_by(email=email).first():
+            return render_template('register.html', error='Email already registered')
+        new_user = User(name=name, email=email, password=password)
+        db.session.add(new_user)
+        db.session.commit()
+        session['user_email'] = email
+        return redirect(url_for('auth.profile'))
+    return render_template('register.html', error=None)
+
+@bp.route('/login', methods=['GET', 'POST'])
+def login():
+    if request.method == 'POST':
+        email = request.form.get('email')
+        password = request.form.get('password')
+        user = User.query.filter_by(email=email).first()
+        if user and user.password == password:
+            session['user_email'] = email
+            return redirect(url_for('auth.profile'))
+        return render_template('login.html', error='Invalid email or password')
+    return render_template('login.html', error=None)
+
+@bp.route('/logout')
+def logout():
+    session.clear()
+    return redirect(url_for('catalog.home'))
@@ -0,0 +1,166 @@
+"""Concurrent checkout check: many threads, one user, no lost updates.
+
+Drives /add_to_cart and /checkout for a single user from many threads at once and then
+checks the database. Every cart item must be bought exactly once, each burst on a
+shared cart must produce exactly one Checkout whether the threads reuse one idempotency
+key or each send their own, and the user's points must equal a replay of the recorded
+checkouts. Exits with status 1 if any check fails.
+
+    python benchmarks/checkout_race.py --threads 16 --rounds 20 --items 5
+"""
+import argparse
+import os
+import random
+import secrets
+import sys
+import tempfile
+import threading
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from sqlalchemy import func, insert  # noqa: E402
+from app import create_app  # noqa: E402
+from models import db, User, Product, CartItem, Purchase, Checkout  # noqa: E402
+
+USER_EMAIL = 'race@example.com'
+START_POINTS = 35
+PRODUCTS = 200
+
+def build_app(database):
+    return create_app({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{database}',
+        'REPAIR_WORKERS': 0,
+        'SECRET_KEY': 'checkout-race',
+    })
+
+def seed(app, products, rng):
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        db.session.execute(insert(Product), [{
+            'name': f'Item {i}', 'description': 'Refurbished item', 'price': round(rng.uniform(5, 300), 2),
+            'image': 'https://example.com/product.jpg', 'age': rng.randint(1, 36),
+        } for i in range(products)])
+        db.session.add(User(name='Race', email=USER_EMAIL, password='password', points=START_POINTS))
+        db.session.commit()
+
+def client_for(app):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_email'] = USER_EMAIL
+    return client
+
+def run_threads(count, target):
+    barrier = threading.Barrier(count)
+    errors = []
+
+    def run(index):
+        try:
+            barrier.wait()
+            target(index)
+        except Exception as e:
+            errors.append(repr(e))
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return errors
+
+def checkout_count(app):
+    with app.app_context():
+        return db.session.query(func.count(Checkout.id)).scalar()
+
+def shared_cart_burst(app, clients, items, rng, same_key):
+    # Fill the cart, then every thread checks it out at the same moment
+    client = clients[0]
+    for _ in range(items):
+        client.post(f'/add_to_cart/{rng.randint(1, PRODUCTS)}')
+    before = checkout_count(app)
+    shared_key = secrets.token_hex(16)
+    statuses = []
+
+    def checkout(index):
+        key = shared_key if same_key else secrets.token_hex(16)
+        statuses.append(clients[index].post('/checkout', data={'idempotency_key': key}).status_code)
+
+    errors = run_threads(len(clients), checkout)
+    errors += [f'checkout returned {s}' for s in statuses if s != 302]
+    created = checkout_count(app) - before
+    if created != 1:
+        errors.append(f'{created} checkouts for one cart')
+    return errors
+
+def interleaved_burst(app, clients, items, rng):
+    # Every thread adds and checks out in a loop, so checkouts race with cart changes
+    # and with each other's points updates
+    statuses = []
+
+    def shop(index):
+        for _ in range(items):
+            statuses.append(clients[index].post(f'/add_to_cart/{rng.randint(1, PRODUCTS)}').status_code)
+            statuses.append(clients[index].post('/checkout', data={'idempotency_key': secrets.token_hex(16)}).status_code)
+
+    errors = run_threads(len(clients), shop)
+    return errors + [f'request returned {s}' for s in statuses if s != 302]
+
+def check_totals(app, added):
+    errors = []
+    with app.app_context():
+        user = User.query.filter_by(email=USER_EMAIL).one()
+        purchases = db.session.query(func.count(Purchase.id)).filter_by(user_id=user.id).scalar()
+        left_in_cart = db.session.query(func.count(CartItem.id)).filter_by(user_id=user.id).scalar()
+        if purchases + left_in_cart != added:
+            errors.append(f'{added} items added but {purchases} bought and {left_in_cart} still in the cart')
+        checkouts = Checkout.query.filter_by(user_id=user.id).order_by(Checkout.id).all()
+        spent = dict(db.session.query(Purchase.checkout_id, func.sum(Purchase.price)).group_by(Purchase.checkout_id).all())
+        points = START_POINTS
+        for order in checkouts:
+            if order.id not in spent:
+                errors.append(f'checkout {order.id} has no purchases')
+            elif abs(spent[order.id] - order.total) > 0.005:
+                errors.append(f'checkout {order.id} total {order.total} but purchases add up to {spent[order.id]}')
+            # Same rule as cart.checkout_cart; SQLite serialises writers, so id order is commit order
+            points = (points - 10 if points > 10 else 0) + int(order.total // 10)
+        if user.points != points:
+            errors.append(f'user has {user.points} points, replaying {len(checkouts)} checkouts gives {points}')
+    return errors, purchases, len(checkouts)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--rounds', type=int, default=10, help='Bursts of each kind')
+    parser.add_argument('--items', type=int, default=5, help='Cart items per burst, and per thread when interleaved')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--database', help='SQLite file to use (default: a temporary file)')
+    args = parser.parse_args()
+    database = args.database or os.path.join(tempfile.mkdtemp(prefix='ecoextend-race-'), 'race.db')
+    rng = random.Random(args.seed)
+
+    app = build_app(database)
+    seed(app, PRODUCTS, rng)
+    clients = [client_for(app) for _ in range(args.threads)]
+    errors = []
+    added = 0
+    for round_index in range(args.rounds):
+        for name, burst in [
+            ('same key', lambda: shared_cart_burst(app, clients, args.items, rng, same_key=True)),
+            ('distinct keys', lambda: shared_cart_burst(app, clients, args.items, rng, same_key=False)),
+            ('interleaved', lambda: interleaved_burst(app, clients, args.items, rng)),
+        ]:
+            errors += [f'round {round_index} {name}: {e}' for e in burst()]
+        added += args.items * 2 + args.items * args.threads
+
+    total_errors, purchases, checkouts = check_totals(app, added)
+    errors += total_errors
+    print(f'{args.threads} threads, {args.rounds} rounds: {added} items added, {purchases} bought in {checkouts} checkouts')
+    for error in errors:
+        print(f'FAIL {error}')
+    if errors:
+        sys.exit(1)
+    print('OK: no lost or duplicated purchases, points consistent')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,250 @@
+"""Offline load test for every EcoExtend route.
+
+Seeds a throwaway SQLite database with synthetic users, products and history, swaps
+Gemini for a fake with configurable latency, then drives the routes through Flask test
+clients from several threads (and optionally processes). Reports requests/sec, latency
+percentiles, SQL queries per request and peak memory, and saves the results as JSON so
+runs can be compared.
+
+    python benchmarks/load.py --users 200 --products 20000 --threads 8 --iterations 50
+    python benchmarks/load.py --processes 4 --compare benchmarks/results/load-20261017-120000.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import secrets
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+try:
+    import resource
+except ImportError:  # Not available on Windows; RSS is reported as unavailable there
+    resource = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from sqlalchemy import event, insert  # noqa: E402
+from app import create_app  # noqa: E402
+from models import db, User, Product, Purchase, RepairRequest, SellBack, Donation, Rental  # noqa: E402
+from catalog_cache import bump_catalog_version  # noqa: E402
+
+SCENARIOS = ['home', 'marketplace', 'add_to_cart', 'checkout', 'profile', 'sell', 'donate', 'repair']
+PRODUCT_NAMES = ['Laptop', 'Chair', 'Electric Bike', 'Refrigerator', 'Air Conditioner', 'Used Smartphone', 'Desk Lamp', 'T-Shirt']
+CONDITIONS = ['good', 'fair', 'excellent', 'poor']
+REPAIR_ISSUES = ['cracked screen', 'dead battery', 'broken hinge', 'flat tire', 'no power']
+
+class FakeGemini:
+    # Stands in for genai.GenerativeModel: sleeps for the configured latency and returns canned text
+    def __init__(self, latency):
+        self.latency = latency
+
+    def generate_content(self, prompt):
+        time.sleep(self.latency)
+        return FakeResponse(f'Fake answer for: {prompt}')
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+def build_app(args):
+    return create_app({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{args.database}',
+        'GEMINI_CLIENT': FakeGemini(args.gemini_latency),
+        'REPAIR_WORKERS': args.repair_workers,
+        'SECRET_KEY': 'benchmark',
+    })
+
+def seed(app, args):
+    rng = random.Random(args.seed)
+    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        db.session.execute(insert(Product), [{
+            'name': rng.choice(PRODUCT_NAMES),
+            'description': f'Refurbished item in {rng.choice(CONDITIONS)} condition',
+            'price': round(rng.uniform(5, 1000), 2),
+            'image': 'https://example.com/product.jpg',
+            'age': rng.randint(1, 60),
+        } for _ in range(args.products)])
+        db.session.execute(insert(User), [{
+            'name': f'User {i}', 'email': f'user{i}@example.com', 'password': 'password', 'points': rng.randint(0, 50),
+        } for i in range(args.users)])
+        user_ids = [row.id for row in db.session.query(User.id)]
+        history = {Purchase: [], RepairRequest: [], SellBack: [], Donation: [], Rental: []}
+        for user_id in user_ids:
+            for _ in range(args.history):
+                name = rng.choice(PRODUCT_NAMES)
+                history[Purchase].append({'user_id': user_id, 'name': name, 'price': round(rng.uniform(5, 1000), 2), 'lifespan': rng.randint(1, 20)})
+                history[RepairRequest].append({'user_id': user_id, 'product_name': name, 'condition': rng.choice(REPAIR_ISSUES),
+                                               'request_date': now, 'repair_guide': 'Step 1: ' * 200})
+                history[SellBack].append({'user_id': user_id, 'product_name': name, 'condition': rng.choice(CONDITIONS),
+                                          'sell_price': round(rng.uniform(5, 500), 2), 'date': now})
+                history[Donation].append({'user_id': user_id, 'product_name': name, 'condition': rng.choice(CONDITIONS), 'date': now})
+                history[Rental].append({'user_id': user_id, 'product_name': name, 'duration_days': 7, 'cost': 10.0})
+        for model, rows in history.items():
+            if rows:
+                db.session.execute(insert(model), rows)
+        bump_catalog_version()
+        db.session.commit()
+
+query_counter = threading.local()
+
+def count_queries(conn, cursor, statement, parameters, context, executemany):
+    query_counter.count = getattr(query_counter, 'count', 0) + 1
+
+def timed(client, samples, name, method, url, **kwargs):
+    query_counter.count = 0
+    start = time.perf_counter()
+    response = client.open(url, method=method, **kwargs)
+    samples.append((name, time.perf_counter() - start, query_counter.count, response.status_code < 400))
+
+def run_scenario(name, client, samples, rng, product_count):
+    product_id = rng.randint(1, product_count)
+    if name == 'home':
+        timed(client, samples, name, 'GET', '/')
+    elif name == 'marketplace':
+        url = rng.choice(['/marketplace', '/marketplace?sort=price', f'/marketplace?min_price={rng.randint(0, 500)}&sort=price_desc',
+                          f'/marketplace?name_prefix={rng.choice(PRODUCT_NAMES)[:3]}'])
+        timed(client, samples, name, 'GET', url)
+    elif name == 'add_to_cart':
+        timed(client, samples, name, 'POST', f'/add_to_cart/{product_id}')
+    elif name == 'checkout':
+        client.post(f'/add_to_cart/{product_id}')
+        timed(client, samples, name, 'POST', '/checkout', data={'idempotency_key': secrets.token_hex(16)})
+    elif name == 'profile':
+        timed(client, samples, name, 'GET', '/profile')
+    elif name == 'sell':
+        timed(client, samples, name, 'POST', '/sell', data={
+            'product_id': product_id, 'condition': rng.choice(CONDITIONS), 'sell_price': f'{rng.uniform(5, 500):.2f}'})
+    elif name == 'donate':
+        timed(client, samples, name, 'POST', '/donate', data={'product_id': product_id, 'condition': rng.choice(CONDITIONS)})
+    elif name == 'repair':
+        timed(client, samples, name, 'POST', '/repair', data={
+            'product_name': rng.choice(PRODUCT_NAMES), 'condition': rng.choice(REPAIR_ISSUES),
+            'location': 'Springfield', 'repair_type': rng.choice(['diy', 'professional'])})
+
+def worker(app, args, worker_index, samples):
+    rng = random.Random(args.seed * 1000 + worker_index)
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_email'] = f'user{worker_index % args.users}@example.com'
+    for _ in range(args.iterations):
+        for name in args.scenarios:
+            run_scenario(name, client, samples, rng, args.products)
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024  # Bytes on macOS, KB elsewhere
+
+def run_process(args, process_index):
+    app = build_app(args)
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', count_queries)
+    samples = []
+    started = time.time()
+    threads = [threading.Thread(target=worker, args=(app, args, process_index * args.threads + i, samples))
+               for i in range(args.threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # Wall-clock window of the load itself, so process startup is not counted
+    return samples, peak_rss_mb(), started, time.time()
+
+def percentile(sorted_values, q):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))]
+
+def summarize(samples, elapsed):
+    scenarios = {}
+    for name in SCENARIOS:
+        rows = [s for s in samples if s[0] == name]
+        if not rows:
+            continue
+        latencies = sorted(s[1] for s in rows)
+        queries = [s[2] for s in rows]
+        scenarios[name] = {
+            'requests': len(rows),
+            'errors': sum(1 for s in rows if not s[3]),
+            'mean_ms': statistics.mean(latencies) * 1000,
+            'p50_ms': percentile(latencies, 0.50) * 1000,
+            'p90_ms': percentile(latencies, 0.90) * 1000,
+            'p99_ms': percentile(latencies, 0.99) * 1000,
+            'queries_mean': statistics.mean(queries),
+            'queries_max': max(queries),
+        }
+    return {'requests': len(samples), 'elapsed_seconds': elapsed, 'requests_per_second': len(samples) / elapsed, 'scenarios': scenarios}
+
+def print_report(results, baseline=None):
+    rss = 'unavailable' if results['max_rss_mb'] is None else f"{results['max_rss_mb']:.1f} MB"
+    print(f"{results['requests']} requests in {results['elapsed_seconds']:.2f}s: "
+          f"{results['requests_per_second']:.1f} req/s, peak RSS {rss}")
+    print(f"{'route':<12} {'reqs':>6} {'err':>4} {'mean ms':>8} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'queries':>8}")
+    for name, s in results['scenarios'].items():
+        line = (f"{name:<12} {s['requests']:>6} {s['errors']:>4} {s['mean_ms']:>8.2f} {s['p50_ms']:>8.2f} "
+                f"{s['p90_ms']:>8.2f} {s['p99_ms']:>8.2f} {s['queries_mean']:>8.1f}")
+        before = (baseline or {}).get('scenarios', {}).get(name)
+        if before:
+            line += f"   p50 {s['p50_ms'] - before['p50_ms']:+.2f} ms, p99 {s['p99_ms'] - before['p99_ms']:+.2f} ms"
+        print(line)
+    if baseline:
+        print(f"throughput {results['requests_per_second'] - baseline['requests_per_second']:+.1f} req/s vs baseline")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--products', type=int, default=5000)
+    parser.add_argument('--history', type=int, default=20, help='Entries per user in each history table')
+    parser.add_argument('--threads', type=int, default=4, help='Client threads per process')
+    parser.add_argument('--processes', type=int, default=1)
+    parser.add_argument('--iterations', type=int, default=20, help='Passes over the scenario list per thread')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='Comma-separated subset of: ' + ', '.join(SCENARIOS))
+    parser.add_argument('--gemini-latency', type=float, default=0.5, help='Seconds per fake Gemini call')
+    parser.add_argument('--repair-workers', type=int, default=2)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--database', help='SQLite file to seed (default: a temporary file)')
+    parser.add_argument('--output', help='Results file (default: benchmarks/results/load-<timestamp>.json)')
+    parser.add_argument('--compare', help='Earlier results file to diff against')
+    args = parser.parse_args()
+    args.scenarios = [s for s in args.scenarios.split(',') if s]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    if not args.database:
+        args.database = os.path.join(tempfile.mkdtemp(prefix='ecoextend-bench-'), 'bench.db')
+
+    seed(build_app(args), args)
+    if args.processes == 1:
+        outputs = [run_process(args, 0)]
+    else:
+        with multiprocessing.get_context('spawn').Pool(args.processes) as pool:
+            outputs = pool.starmap(run_process, [(args, i) for i in range(args.processes)])
+    samples = [s for output in outputs for s in output[0]]
+    rss = [output[1] for output in outputs if output[1] is not None]
+    elapsed = max(output[3] for output in outputs) - min(output[2] for output in outputs)
+
+    results = summarize(samples, elapsed)
+    results['max_rss_mb'] = max(rss) if rss else None
+    results['config'] = {k: v for k, v in vars(args).items() if k not in ('output', 'compare')}
+    results['timestamp'] = datetime.now().isoformat(timespec='seconds')
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(results, baseline)
+    output = args.output or os.path.join(ROOT, 'benchmarks', 'results', f"load-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f'Saved {output}')
+
+if __name__ == '__main__':
+    main()
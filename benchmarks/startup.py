@@ -0,0 +1,79 @@
+"""Measure per-worker startup cost: import time, peak RSS and loaded modules.
+
+Compares the lazy Gemini client that workers use now with creating it eagerly at
+startup, which is what importing app.py used to do. Every sample runs in a fresh
+interpreter so nothing is shared between runs.
+
+    python benchmarks/startup.py --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = '''
+import json, sys, time
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+start = time.perf_counter()
+from app import create_app
+app = create_app()
+if {eager}:
+    with app.app_context():
+        from gemini import get_model
+        get_model()
+print(json.dumps({{
+    'seconds': time.perf_counter() - start,
+    'max_rss_kb': None if resource is None else resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // (1024 if sys.platform == 'darwin' else 1),
+    'modules': len(sys.modules),
+}}))
+'''
+
+def sample(eager):
+    pythonpath = os.pathsep.join(filter(None, [ROOT, os.environ.get('PYTHONPATH')]))
+    env = dict(os.environ, DATABASE_URL='sqlite://', PYTHONPATH=pythonpath)
+    result = subprocess.run([sys.executable, '-c', PROBE.format(eager=eager)], cwd=ROOT, env=env,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        return None, result.stderr.strip().splitlines()[-1]
+    return json.loads(result.stdout.strip().splitlines()[-1]), None
+
+def measure(eager, runs):
+    samples = []
+    for _ in range(runs):
+        data, error = sample(eager)
+        if error:
+            return {'error': error}
+        samples.append(data)
+    return {
+        'seconds_median': statistics.median(s['seconds'] for s in samples),
+        'seconds_min': min(s['seconds'] for s in samples),
+        'max_rss_mb': None if samples[0]['max_rss_kb'] is None else statistics.median(s['max_rss_kb'] for s in samples) / 1024,
+        'modules': samples[-1]['modules'],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--output', help='Write the results to this JSON file')
+    args = parser.parse_args()
+    results = {'lazy': measure(False, args.runs), 'eager': measure(True, args.runs)}
+    for mode, r in results.items():
+        if 'error' in r:
+            print(f"{mode:>5}: failed ({r['error']})")
+        else:
+            rss = 'n/a' if r['max_rss_mb'] is None else f"{r['max_rss_mb']:6.1f} MB"
+            print(f"{mode:>5}: {r['seconds_median'] * 1000:7.1f} ms median, {r['seconds_min'] * 1000:7.1f} ms min, "
+                  f"RSS {rss}, {r['modules']} modules")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+import secrets
+from flask import Blueprint, render_template, request, redirect, url_for
+from sqlalchemy import case, delete, insert, update
+from sqlalchemy.exc import IntegrityError
+from models import db, User, Product, CartItem, Purchase, Checkout
+from auth import get_user
+from lifespan import predict_lifespan
+
+bp = Blueprint('cart', __name__)
+
+@bp.app_context_processor
+def inject_cart_count():
+    user = get_user()
+    cart_count = CartItem.query.filter_by(user_id=user.id).count() if user else 0
+    return dict(cart_count=cart_count)
+
+def cart_items_for(user):
+    if not user:
+        return []
+    return CartItem.query.filter_by(user_id=user.id).order_by(CartItem.id).all()
+
+@bp.route('/add_to_cart/<int:product_id>', methods=['POST'])
+def add_to_cart(product_id):
+    user = get_user()
+    if not user:
+        return redirect(url_for('auth.login'))
+    product = Product.query.get(product_id)
+    if product:
+        db.session.add(CartItem(
+            user_id=user.id,
+            product_id=product.id,
+            name=product.name,
+            description=product.description,
+            price=product.price,
+            image=product.image,
+            lifespan=predict_lifespan(product)
+        ))
+        db.session.commit()
+    return redirect(request.referrer or url_for('catalog.home'))
+
+@bp.route('/cart')
+def cart():
+    user = get_user()
+    if not user:
+        return redirect(url_for('auth.login'))
+    cart_items = cart_items_for(user)
+    total = sum(item.price for item in cart_items)
+    return render_template('cart.html', cart=cart_items, total=total, idempotency_key=secrets.token_hex(16))
+
+@bp.route('/remove_from_cart/<int:item_id>', methods=['POST'])
+def remove_from_cart(item_id):
+    user = get_user()
+    if user:
+        CartItem.query.filter_by(id=item_id, user_id=user.id).delete()
+        db.session.commit()
+    return redirect(url_for('cart.cart'))
+
+def checkout_cart(user_id, idempotency_key):
+    # A single short transaction. The Checkout insert fails on a reused key before anything
+    # else is touched, DELETE ... RETURNING claims the cart rows so two concurrent checkouts
+    # can never both buy them, and points change through one UPDATE expression instead of
+    # a read-modify-write in Python.
+    order = Checkout(user_id=user_id, idempotency_key=idempotency_key)
+    db.session.add(order)
+    db.session.flush()
+    items = db.session.execute(
+        delete(CartItem).where(CartItem.user_id == user_id).returning(
+            CartItem.product_id, CartItem.name, CartItem.description, CartItem.price, CartItem.image, CartItem.lifespan)
+    ).all()
+    if not items:
+        db.session.rollback()
+        return None
+    total = sum(item.price for item in items)
+    order.total = total
+    db.session.execute(insert(Purchase), [dict(item._mapping, user_id=user_id, checkout_id=order.id) for item in items])
+    # Use up to 10 points (max 10% discount, simulated) and gain one per $10 spent
+    db.session.execute(update(User).where(User.id == user_id).values(
+        points=case((User.points > 10, User.points - 10), else_=0) + int(total // 10)))
+    db.session.commit()
+    return order
+
+@bp.route('/checkout', methods=['POST'])
+def checkout():
+    user = get_user()
+    if not user:
+        return redirect(url_for('auth.login'))
+    try:
+        checkout_cart(user.id, request.form.get('idempotency_key') or secrets.token_hex(16))
+    except IntegrityError:
+        # Already processed under this key (double submit or retry)
+        db.session.rollback()
+    return redirect(url_for('auth.profile'))
@@ -0,0 +1,146 @@
+import json
+import math
+import base64
+import binascii
+from flask import Blueprint, render_template, request
+from markupsafe import Markup
+from sqlalchemy import and_, or_, func
+from models import Product
+from auth import get_user
+from cart import cart_items_for
+from lifespan import predict_many
+from catalog_cache import catalog_version, cached_catalog_page, cached_fragment, render_cached
+from recommendations import recommend_products, get_recommendation_index, products_by_ids
+
+bp = Blueprint('catalog', __name__)
+
+# Catalog queries: filtering, sorting and keyset pagination all happen in SQL.
+# Every sort also orders by id so the (value, id) pair in a cursor is unique; on SQLite
+# the single-column Product indexes in models.py already carry the rowid, so they serve
+# that ordering too.
+CATALOG_SORTS = {
+    'id': (Product.id, False),
+    'price': (Product.price, False),
+    'price_desc': (Product.price, True),
+    'age': (Product.age, False),
+    'name': (Product.name, False),
+}
+DEFAULT_PAGE_SIZE = 24
+MAX_PAGE_SIZE = 100
+PICKER_PAGE_SIZE = 50  # Options per page in the sell/donate product pickers
+
+def encode_cursor(value, last_id):
+    return base64.urlsafe_b64encode(json.dumps([value, last_id]).encode()).decode()
+
+def decode_cursor(cursor, column=Product.id):
+    # Cursors come back from the client, so anything that is not [value, id] with a value
+    # of the sort column's type is treated as no cursor and the listing starts over
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError, binascii.Error):
+        return None
+    if not isinstance(position, list) or len(position) != 2:
+        return None
+    value, last_id = position
+    expected = (int, float) if column.type.python_type is float else column.type.python_type
+    if isinstance(last_id, bool) or not isinstance(last_id, int) or isinstance(value, bool) or not isinstance(value, expected):
+        return None
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value, last_id
+
+def query_catalog(cursor=None, limit=DEFAULT_PAGE_SIZE, min_price=None, max_price=None, max_age=None, name_prefix=None, sort='id'):
+    column, descending = CATALOG_SORTS.get(sort, CATALOG_SORTS['id'])
+    query = Product.query
+    if min_price is not None:
+        query = query.filter(Product.price >= min_price)
+    if max_price is not None:
+        query = query.filter(Product.price <= max_price)
+    if max_age is not None:
+        query = query.filter(Product.age <= max_age)
+    if name_prefix:
+        # A range on lower(name) instead of LIKE, so ix_product_name_lower is searched, not scanned
+        name = func.lower(Product.name)
+        query = query.filter(name >= func.lower(name_prefix), name < func.lower(name_prefix + '\U0010ffff'))
+    position = decode_cursor(cursor, column) if cursor else None
+    if position:
+        value, last_id = position
+        if column is Product.id:
+            query = query.filter(Product.id > last_id)
+        else:
+            past_value = column < value if descending else column > value
+            query = query.filter(or_(past_value, and_(column == value, Product.id > last_id)))
+    query = query.order_by(column.desc() if descending else column, Product.id)
+    # Fetch one extra row to know whether another page exists
+    rows = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, column.key), last.id)
+    return rows, next_cursor
+
+def featured_products(user_cart, limit=3):
+    if user_cart:
+        return products_by_ids(get_recommendation_index().recommend(user_cart, limit))
+    return Product.query.order_by(Product.id).limit(limit).all()
+
+def product_choices(search=None, cursor=None):
+    # One page of the sell/donate picker, by name, optionally narrowed to a name prefix
+    return query_catalog(cursor=cursor, limit=PICKER_PAGE_SIZE, name_prefix=search, sort='name')
+
+def cart_signature(user_cart):
+    return tuple((item.product_id, item.price, item.name) for item in user_cart)
+
+def render_cards(products):
+    for p, lifespan in zip(products, predict_many(products)):
+        setattr(p, 'lifespan', lifespan)
+        setattr(p, 'type', 'refurb')
+    return render_template('_product_cards.html', products=products)
+
+@bp.route('/')
+@cached_catalog_page
+def home():
+    user_cart = cart_items_for(get_user())
+    version, _ = catalog_version()
+    grid = render_cached(('home', version, cart_signature(user_cart)),
+                         lambda: render_cards(featured_products(user_cart)))
+    return render_template('home.html', grid=grid)
+
+def marketplace_grid(user_cart, active_filters, limit, cursor=None, offset=0):
+    next_page = None
+    if user_cart and not active_filters:
+        # Recommended view over the whole catalog, paged by rank
+        ids = get_recommendation_index().nearest(sum(item.price for item in user_cart) / len(user_cart), limit + 1, skip=offset)
+        if len(ids) > limit:
+            next_page = {'offset': offset + limit, 'limit': limit}
+        products = products_by_ids(ids[:limit])
+    else:
+        products, next_cursor = query_catalog(cursor=cursor, limit=limit, **active_filters)
+        if next_cursor:
+            next_page = dict(active_filters, cursor=next_cursor, limit=limit)
+        if 'sort' not in active_filters:
+            # Filtered page without an explicit sort: order the page by similarity to the cart
+            products = recommend_products(user_cart, products)
+    return render_cards(products), next_page
+
+@bp.route('/marketplace')
+@cached_catalog_page
+def marketplace():
+    filters = {
+        'min_price': request.args.get('min_price', type=float),
+        'max_price': request.args.get('max_price', type=float),
+        'max_age': request.args.get('max_age', type=int),
+        'name_prefix': request.args.get('name_prefix') or None,
+        'sort': request.args.get('sort') if request.args.get('sort') in CATALOG_SORTS else None,
+    }
+    limit = max(1, min(request.args.get('limit', DEFAULT_PAGE_SIZE, type=int), MAX_PAGE_SIZE))
+    active_filters = {k: v for k, v in filters.items() if v is not None}
+    user_cart = cart_items_for(get_user())
+    cursor = request.args.get('cursor')
+    offset = max(0, request.args.get('offset', 0, type=int))
+    version, _ = catalog_version()
+    key = ('marketplace', version, tuple(sorted(active_filters.items())), limit, cursor, offset, cart_signature(user_cart))
+    grid, next_page = cached_fragment(key, lambda: marketplace_grid(user_cart, active_filters, limit, cursor, offset))
+    return render_template('marketplace.html', grid=Markup(grid), title='Marketplace',
+                           filters=active_filters, next_page=next_page)
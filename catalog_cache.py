@@ -0,0 +1,100 @@
+import hashlib
+import threading
+import time
+from datetime import datetime, timezone
+from functools import wraps
+from cachetools import TTLCache
+from flask import current_app, make_response, request, session
+from markupsafe import Markup
+from sqlalchemy import update
+from models import db, app_state, CatalogVersion
+
+# The catalog only changes when someone sells or donates, so rendered product grids and
+# whole anonymous catalog pages are cached against a version counter kept in the
+# database. Each process re-reads the counter at most every CATALOG_VERSION_TTL seconds,
+# so another worker's change can take that long to show up here.
+CATALOG_VERSION_TTL = 2.0
+fragment_cache_lock = threading.Lock()
+catalog_version_lock = threading.Lock()
+
+def fragment_cache():
+    return app_state('fragment_cache', lambda: TTLCache(maxsize=1024, ttl=600))
+
+def catalog_version_state():
+    return app_state('catalog_version', lambda: {'version': None, 'updated_at': None, 'checked': 0.0})
+
+def utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)
+
+def catalog_version():
+    with catalog_version_lock:
+        state = dict(catalog_version_state())
+    if state['version'] is not None and time.monotonic() - state['checked'] < CATALOG_VERSION_TTL:
+        return state['version'], state['updated_at']
+    row = db.session.get(CatalogVersion, 1)
+    version, updated_at = (row.version, row.updated_at) if row else (0, datetime(1970, 1, 1))
+    with catalog_version_lock:
+        catalog_version_state().update(version=version, updated_at=updated_at, checked=time.monotonic())
+    return version, updated_at
+
+def ensure_catalog_version():
+    # Create row id 1 up front (from init-db); otherwise the first two concurrent bumps
+    # would both try to insert it
+    if db.session.get(CatalogVersion, 1) is None:
+        db.session.add(CatalogVersion(id=1, version=0, updated_at=utcnow()))
+        db.session.commit()
+
+def bump_catalog_version():
+    # Call inside the transaction that changes Product rows; returns the new version
+    now = utcnow()
+    version = db.session.execute(update(CatalogVersion).where(CatalogVersion.id == 1).values(
+        version=CatalogVersion.version + 1, updated_at=now).returning(CatalogVersion.version)).scalar()
+    if version is None:
+        version = 1
+        db.session.add(CatalogVersion(id=1, version=version, updated_at=now))
+    with catalog_version_lock:
+        catalog_version_state()['checked'] = 0.0  # Re-read on the next request
+    return version
+
+def cached_fragment(key, render):
+    with fragment_cache_lock:
+        cached = fragment_cache().get(key)
+    if cached is None:
+        cached = render()
+        with fragment_cache_lock:
+            fragment_cache()[key] = cached
+    return cached
+
+def render_cached(key, render):
+    return Markup(cached_fragment(key, render))
+
+def cached_catalog_page(view):
+    # Anonymous visitors all see the same page for a given URL and catalog version, so
+    # they get an ETag/Last-Modified pair, 304s, and cached HTML without any catalog
+    # queries. Signed-in pages carry per-user bits (cart badge, recommendations) and are
+    # rendered per request, with a body-hash ETag so unchanged pages still get a 304.
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if session.get('user_email'):
+            response = make_response(view(*args, **kwargs))
+            response.headers['Cache-Control'] = 'private, no-cache'
+            response.add_etag()
+            return response.make_conditional(request)
+        version, updated_at = catalog_version()
+        etag = hashlib.sha1(f'{version}:{request.full_path}'.encode()).hexdigest()
+        last_modified = updated_at.replace(tzinfo=timezone.utc)
+        if request.if_none_match:
+            fresh = request.if_none_match.contains(etag)
+        else:
+            fresh = request.if_modified_since is not None and last_modified <= request.if_modified_since
+        if fresh:
+            response = current_app.response_class(status=304)
+        else:
+            body = cached_fragment(('page', version, request.full_path), lambda: view(*args, **kwargs))
+            response = current_app.response_class(body, mimetype='text/html')
+        response.set_etag(etag)
+        response.last_modified = last_modified
+        response.headers['Cache-Control'] = 'public, no-cache'
+        response.vary.add('Cookie')
+        return response
+    return wrapper
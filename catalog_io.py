@@ -0,0 +1,216 @@
+import csv
+import json
+import math
+import os
+import time
+from itertools import islice
+import click
+from cachetools import LRUCache
+from flask.cli import with_appcontext
+from sqlalchemy import String, and_, cast, func, literal, or_, select
+from models import db, Product
+from catalog_cache import bump_catalog_version
+
+# Partner feeds of refurbished stock, one product per CSV row or JSON line. Feeds are
+# streamed and written in batches, one transaction each, so memory stays flat however
+# large the feed is. Rows are matched to existing products by sku, so re-importing a
+# feed updates listings in place instead of adding them twice. Skus already seen in the
+# feed are remembered in a bounded LRU window, so repeats are skipped across batches too.
+# Products listed through the site have no sku; they are exported as ecoextend-<id> and
+# matched back by id on import, so an export always round-trips.
+CATALOG_FIELDS = ('sku', 'name', 'description', 'price', 'image', 'age')
+SITE_SKU_PREFIX = 'ecoextend-'
+IMPORT_BATCH_SIZE = 1000
+DEDUPE_WINDOW = 200000  # Distinct skus remembered, roughly 40 MB at the limit
+EXPORT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 20
+PROGRESS_INTERVAL = 1.0  # Seconds between progress lines
+
+def feed_format(path, fmt):
+    if fmt:
+        return fmt
+    if path == '-':
+        return 'csv'
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.csv':
+        return 'csv'
+    if ext in ('.jsonl', '.ndjson'):
+        return 'jsonl'
+    raise click.BadParameter(f'cannot tell the format of {path!r}, pass --format', param_hint='PATH')
+
+def read_feed(handle, fmt):
+    # Yields (line number, raw row); JSON lines are decoded in clean_product so one bad
+    # line is reported instead of ending the import
+    if fmt == 'csv':
+        reader = csv.DictReader(handle)
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        for line_num, line in enumerate(handle, 1):
+            if line.strip():
+                yield line_num, line
+
+def clean_product(raw):
+    if isinstance(raw, str):
+        raw = json.loads(raw)
+    if not isinstance(raw, dict):
+        raise ValueError('expected an object')
+    row = {}
+    for field in ('sku', 'name', 'description', 'image'):
+        value = raw.get(field)
+        value = '' if value is None else str(value).strip()
+        if not value:
+            raise ValueError(f'missing {field}')
+        limit = Product.__table__.c[field].type.length
+        if len(value) > limit:
+            raise ValueError(f'{field} is longer than {limit} characters')
+        row[field] = value
+    try:
+        row['price'] = float(raw.get('price'))
+    except (TypeError, ValueError):
+        raise ValueError('price is not a number')
+    if not math.isfinite(row['price']) or row['price'] < 0:
+        raise ValueError('price must be zero or more')
+    try:
+        row['age'] = int(raw.get('age'))
+    except (TypeError, ValueError):
+        raise ValueError('age is not a whole number of months')
+    if row['age'] < 0:
+        raise ValueError('age must be zero or more')
+    return row
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+def catalog_sku():
+    # The stored sku, or the synthetic one for products listed through the site
+    return func.coalesce(Product.sku, literal(SITE_SKU_PREFIX) + cast(Product.id, String))
+
+def site_product_id(sku):
+    suffix = sku[len(SITE_SKU_PREFIX):]
+    return int(suffix) if sku.startswith(SITE_SKU_PREFIX) and suffix.isascii() and suffix.isdigit() else None
+
+def catalog_columns():
+    return [catalog_sku().label('sku')] + [Product.__table__.c[field] for field in CATALOG_FIELDS if field != 'sku']
+
+def upsert_products(rows):
+    # rows maps sku -> cleaned row. Unchanged products are skipped so re-importing a
+    # full feed only writes what moved.
+    site_ids = [i for i in map(site_product_id, rows) if i is not None]
+    existing = {r.sku: r for r in db.session.execute(
+        select(Product.id, *catalog_columns()).where(or_(
+            Product.sku.in_(list(rows)), and_(Product.sku.is_(None), Product.id.in_(site_ids)))))}
+    inserts, updates = [], []
+    for sku, row in rows.items():
+        current = existing.get(sku)
+        if current is None:
+            inserts.append(row)
+        elif any(getattr(current, field) != row[field] for field in CATALOG_FIELDS):
+            updates.append(dict(row, id=current.id))
+    if inserts:
+        db.session.bulk_insert_mappings(Product, inserts)
+    if updates:
+        db.session.bulk_update_mappings(Product, updates)
+    if inserts or updates:
+        bump_catalog_version()
+    db.session.commit()
+    return len(inserts), len(updates)
+
+class Progress:
+    def __init__(self, verb):
+        self.verb = verb
+        self.rows = 0
+        self.started = self.reported = time.monotonic()
+
+    @property
+    def rate(self):
+        return self.rows / max(time.monotonic() - self.started, 1e-9)
+
+    def advance(self, rows):
+        self.rows += rows
+        now = time.monotonic()
+        if now - self.reported >= PROGRESS_INTERVAL:
+            self.reported = now
+            click.echo(f'{self.verb} {self.rows} rows ({self.rate:.0f} rows/s)', err=True)
+
+    def done(self, detail=''):
+        elapsed = time.monotonic() - self.started
+        click.echo(f'{self.verb} {self.rows} rows in {elapsed:.1f}s ({self.rate:.0f} rows/s){detail}', err=True)
+
+@click.group('catalog')
+def catalog_cli():
+    """Bulk import and export of the product catalog."""
+
+@catalog_cli.command('import')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), help='Defaults to the file extension.')
+@click.option('--batch-size', default=IMPORT_BATCH_SIZE, show_default=True, type=click.IntRange(1, 10000),
+              help='Rows written per transaction.')
+@click.option('--dedupe-window', default=DEDUPE_WINDOW, show_default=True, type=click.IntRange(1),
+              help='Distinct skus remembered to skip repeats.')
+@with_appcontext
+def import_catalog(path, fmt, batch_size, dedupe_window):
+    """Insert or update products from a CSV or JSON lines feed.
+
+    Each row needs sku, name, description, price, image and age. Invalid rows are
+    reported and skipped. When a sku repeats, its first row wins and later ones are
+    counted as duplicates, as long as the repeat falls within the last --dedupe-window
+    distinct skus. Skus of the form ecoextend-<id>, as written by export, update the
+    site-listed product with that id.
+    """
+    fmt = feed_format(path, fmt)
+    seen = LRUCache(maxsize=dedupe_window)
+    progress = Progress('Imported')
+    inserted = updated = duplicates = invalid = 0
+    with open(path, newline='', encoding='utf-8-sig') as handle:
+        for batch in batched(read_feed(handle, fmt), batch_size):
+            rows = {}
+            for line_num, raw in batch:
+                try:
+                    row = clean_product(raw)
+                except ValueError as e:
+                    invalid += 1
+                    if invalid <= MAX_REPORTED_ERRORS:
+                        click.echo(f'line {line_num}: {e}', err=True)
+                    continue
+                if row['sku'] in seen:
+                    duplicates += 1
+                    continue
+                seen[row['sku']] = True
+                rows[row['sku']] = row
+            if rows:
+                batch_inserted, batch_updated = upsert_products(rows)
+                inserted += batch_inserted
+                updated += batch_updated
+            progress.advance(len(batch))
+    if invalid > MAX_REPORTED_ERRORS:
+        click.echo(f'... {invalid - MAX_REPORTED_ERRORS} more invalid rows', err=True)
+    progress.done(f': {inserted} inserted, {updated} updated, {duplicates} duplicate, {invalid} invalid')
+
+@catalog_cli.command('export')
+@click.argument('path')
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), help='Defaults to the file extension.')
+@with_appcontext
+def export_catalog(path, fmt):
+    """Write every product to a CSV or JSON lines file, or to stdout with "-".
+
+    Stdout gets CSV unless --format says otherwise. The output can be fed back to
+    `flask catalog import`. Products listed through the site have no sku and are
+    exported as ecoextend-<id>.
+    """
+    fmt = feed_format(path, fmt)
+    query = select(*catalog_columns()).order_by(Product.id).execution_options(yield_per=EXPORT_BATCH_SIZE)
+    progress = Progress('Exported')
+    with click.open_file(path, 'w', encoding='utf-8', atomic=path != '-') as handle:
+        if fmt == 'csv':
+            writer = csv.writer(handle, lineterminator='\n')
+            writer.writerow(CATALOG_FIELDS)
+        for partition in db.session.execute(query).partitions():
+            if fmt == 'csv':
+                writer.writerows(partition)
+            else:
+                handle.writelines(json.dumps(row._asdict()) + '\n' for row in partition)
+            progress.advance(len(partition))
+    progress.done()
@@ -0,0 +1,113 @@
+import random
+from datetime import datetime, timedelta
+from flask import Blueprint, render_template, request, redirect, url_for
+from models import db, Product, Rental, SellBack, Donation
+from auth import get_user
+from catalog import product_choices
+from catalog_cache import bump_catalog_version
+from recommendations import recommendation_index
+
+bp = Blueprint('circular', __name__)
+
+def picker_args():
+    # Search box and page of the product picker on /sell and /donate
+    return request.args.get('q', '').strip(), request.args.get('cursor')
+
+@bp.route('/rent/<int:product_id>', methods=['POST'])
+def rent_product(product_id):
+    user = get_user()
+    if not user:
+        return redirect(url_for('auth.login'))
+    duration_days = int(request.form.get('duration_days', 7))
+    prod = Product.query.get(product_id)
+    if prod:
+        rental_cost = (prod.price / 30) * duration_days  # Simple daily rate
+        end_date = datetime.now() + timedelta(days=duration_days)
+        db.session.add(Rental(
+            user_id=user.id,
+            product_name=prod.name,
+            duration_days=duration_days,
+            cost=rental_cost,
+            end_date=end_date.strftime('%Y-%m-%d')
+        ))
+        db.session.commit()
+    return redirect(request.referrer or url_for('catalog.home'))
+
+@bp.route('/sell', methods=['GET', 'POST'])
+def sell_product():
+    user = get_user()
+    if not user:
+        return redirect(url_for('auth.login'))
+    message = None
+    error = None
+    if request.method == 'POST':
+        product_id = request.form.get('product_id')
+        condition = request.form.get('condition')
+        sell_price_str = request.form.get('sell_price')
+        if not sell_price_str:
+            error = 'Sell price is required'
+        else:
+            try:
+                sell_price = float(sell_price_str)
+            except ValueError:
+                error = 'Invalid sell price'
+                sell_price = None
+        if not error:
+            prod = Product.query.get(product_id)
+            if prod:
+                days = random.randint(3, 7)
+                pickup_date = datetime.now() + timedelta(days=days)
+                new_listing = Product(
+                    name=prod.name,
+                    description=f'Sold {prod.name} in {condition} condition',
+                    price=sell_price,
+                    image=prod.image,
+                    age=prod.age
+                )
+                db.session.add(new_listing)
+                db.session.add(SellBack(
+                    user_id=user.id,
+                    product_name=prod.name,
+                    condition=condition,
+                    sell_price=sell_price,
+                    pickup_date=pickup_date.strftime('%Y-%m-%d'),
+                    date=datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                ))
+                version = bump_catalog_version()
+                db.session.commit()
+                recommendation_index().add(new_listing, version)
+                message = f"Pickup scheduled for {pickup_date.strftime('%Y-%m-%d')}."
+                return redirect(url_for('catalog.marketplace'))
+    search, cursor = picker_args()
+    prods, next_page = product_choices(search, cursor)
+    return render_template('sell.html', products=prods, next_page=next_page, search=search, error=error, message=message)
+
+@bp.route('/donate', methods=['GET', 'POST'])
+def donate_product():
+    user = get_user()
+    if not user:
+        return redirect(url_for('auth.login'))
+    message = None
+    if request.method == 'POST':
+        product_id = request.form.get('product_id')
+        condition = request.form.get('condition')
+        prod = Product.query.get(product_id)
+        if prod:
+            days = random.randint(3, 7)
+            pickup_date = datetime.now() + timedelta(days=days)
+            db.session.add(Donation(
+                user_id=user.id,
+                product_name=prod.name,
+                condition=condition,
+                pickup_date=pickup_date.strftime('%Y-%m-%d'),
+                date=datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            ))
+            product_id = prod.id
+            db.session.delete(prod)  # Remove from marketplace
+            version = bump_catalog_version()
+            db.session.commit()
+            recommendation_index().remove(product_id, version)
+            message = f"Pickup scheduled for {pickup_date.strftime('%Y-%m-%d')}."
+    search, cursor = picker_args()
+    prods, next_page = product_choices(search, cursor)
+    return render_template('donate.html', products=prods, next_page=next_page, search=search, message=message)
@@ -0,0 +1,98 @@
+import random
+import threading
+import time
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateIndex
+from models import db, User, Product, LEGACY_HISTORY
+from catalog_cache import bump_catalog_version, ensure_catalog_version
+from catalog_io import catalog_cli
+from repair import repair_worker_loop, REPAIR_POLL_INTERVAL
+
+# Create DB and seed data if empty. Run once per deployment, not on worker startup.
+@click.command('init-db')
+@with_appcontext
+def init_db():
+    """Create the tables and seed the catalog if it is empty."""
+    db.create_all()
+    # create_all skips tables that already exist, so add newer catalog columns and indexes to older databases
+    if 'sku' not in {column['name'] for column in inspect(db.engine).get_columns('product')}:
+        with db.engine.begin() as conn:
+            conn.execute(text('ALTER TABLE product ADD COLUMN sku VARCHAR(64)'))
+    # IF NOT EXISTS rather than checkfirst: SQLite cannot reflect the lower(name) expression index
+    with db.engine.begin() as conn:
+        for index in Product.__table__.indexes:
+            conn.execute(CreateIndex(index, if_not_exists=True))
+    ensure_catalog_version()
+    if Product.query.count() == 0:
+        # Seed refurbished products with age
+        initial_products = [
+            {'name': 'T-Shirt', 'description': 'Cotton t-shirt', 'price': 20.0, 'image': 'https://images.pexels.com/photos/996329/pexels-photo-996329.jpeg?auto=compress&cs=tinysrgb&w=1260&h=750&dpr=1', 'age': random.randint(1, 36)},
+            {'name': 'Laptop', 'description': 'Refurbished laptop', 'price': 500.0, 'image': 'https://images.pexels.com/photos/18105/pexels-photo.jpg?auto=compress&cs=tinysrgb&w=1260&h=750&dpr=1', 'age': random.randint(1, 36)},
+            {'name': 'Chair', 'description': 'Office chair', 'price': 100.0, 'image': 'https://images.pexels.com/photos/116910/pexels-photo-116910.jpeg?auto=compress&cs=tinysrgb&w=1260&h=750&dpr=1', 'age': random.randint(1, 36)},
+            {'name': 'Electric Bike', 'description': 'Eco-friendly electric vehicle', 'price': 800.0, 'image': 'https://images.pexels.com/photos/2526128/pexels-photo-2526128.jpeg?auto=compress&cs=tinysrgb&w=1260&h=750&dpr=1', 'age': random.randint(1, 36)},
+            {'name': 'Refrigerator', 'description': 'Energy-efficient fridge', 'price': 600.0, 'image': 'https://images.pexels.com/photos/2131620/pexels-photo-2131620.jpeg?auto=compress&cs=tinysrgb&w=1260&h=750&dpr=1', 'age': random.randint(1, 36)},
+            {'name': 'Air Conditioner', 'description': 'Efficient cooling unit', 'price': 400.0, 'image': 'https://images.pexels.com/photos/577514/pexels-photo-577514.jpeg?auto=compress&cs=tinysrgb&w=1260&h=750&dpr=1', 'age': random.randint(1, 36)},
+            {'name': 'Used Smartphone', 'description': 'Refurbished smartphone in good condition', 'price': 300.0, 'image': 'https://images.pexels.com/photos/248528/pexels-photo-248528.jpeg?auto=compress&cs=tinysrgb&w=1260&h=750&dpr=1', 'age': random.randint(1, 36)},
+            {'name': 'Desk Lamp', 'description': 'Refurbished desk lamp in fair condition', 'price': 15.0, 'image': 'https://images.pexels.com/photos/1112598/pexels-photo-1112598.jpeg?auto=compress&cs=tinysrgb&w=1260&h=750&dpr=1', 'age': random.randint(1, 36)}
+        ]
+        for p in initial_products:
+            db.session.add(Product(**p))
+        bump_catalog_version()
+        db.session.commit()
+    click.echo('Database initialized')
+
+def legacy_history_row(model, user_id, entry):
+    entry = dict(entry)
+    if 'id' in entry:
+        # Cart and purchase entries stored the product id as 'id'
+        entry['product_id'] = entry.pop('id')
+    columns = set(model.__table__.columns.keys()) - {'id'}
+    row = {k: v for k, v in entry.items() if k in columns}
+    row['user_id'] = user_id
+    return row
+
+@click.command('migrate-history')
+@with_appcontext
+def migrate_history():
+    """Move the legacy JSON history columns on User into their own tables."""
+    moved = 0
+    last_id = 0
+    while True:
+        users = User.query.filter(User.id > last_id).order_by(User.id).limit(200).all()
+        if not users:
+            break
+        for user in users:
+            for column, model in LEGACY_HISTORY.items():
+                entries = getattr(user, column) or []
+                if entries:
+                    db.session.bulk_insert_mappings(model, [legacy_history_row(model, user.id, e) for e in entries])
+                    moved += len(entries)
+                    setattr(user, column, [])
+        db.session.commit()
+        last_id = users[-1].id
+    click.echo(f'Moved {moved} history entries')
+
+@click.command('repair-worker')
+@with_appcontext
+@click.option('--threads', default=4, help='Concurrent jobs to run.')
+def repair_worker(threads):
+    """Process repair jobs until interrupted."""
+    app = current_app._get_current_object()
+    workers = [threading.Thread(target=repair_worker_loop, args=(app,), daemon=True) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    click.echo(f'Running {threads} repair workers')
+    try:
+        while True:
+            time.sleep(REPAIR_POLL_INTERVAL)
+    except KeyboardInterrupt:
+        pass
+
+def register_commands(app):
+    app.cli.add_command(init_db)
+    app.cli.add_command(migrate_history)
+    app.cli.add_command(repair_worker)
+    app.cli.add_command(catalog_cli)
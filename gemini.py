@@ -0,0 +1,75 @@
+import os
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from flask import current_app
+from models import db, GeminiCache
+from instrumentation import record_gemini_call
+
+# Gemini calls: cache hits come from the GeminiCache table, misses run concurrently on a
+# thread pool. Set app.config['GEMINI_CLIENT'] to any object with generate_content(prompt)
+# returning something with .text to stand in for Gemini (tests, benchmarks).
+GEMINI_CACHE_TTL = timedelta(days=7)
+GEMINI_CACHE_MAX_ENTRIES = 5000
+gemini_executor = ThreadPoolExecutor(max_workers=8)
+model = None
+model_lock = threading.Lock()
+
+def get_model():
+    # google.generativeai pulls in grpc and protobuf, so it is only imported by the first
+    # worker that actually needs Gemini rather than by every process at startup
+    global model
+    client = current_app.config.get('GEMINI_CLIENT')
+    if client is not None:
+        return client
+    with model_lock:
+        if model is None:
+            import google.generativeai as genai  # pip install google-generativeai
+            genai.configure(api_key=os.getenv('GEMINI_API_KEY'))  # Set GEMINI_API_KEY in env
+            model = genai.GenerativeModel(current_app.config['GEMINI_MODEL'])
+    return model
+
+def prompt_cache_key(prompt):
+    normalized = ' '.join(prompt.lower().split())
+    return hashlib.sha256(normalized.encode()).hexdigest()
+
+def evict_gemini_cache():
+    GeminiCache.query.filter(GeminiCache.created_at < datetime.now() - GEMINI_CACHE_TTL).delete()
+    overflow = GeminiCache.query.count() - GEMINI_CACHE_MAX_ENTRIES
+    if overflow > 0:
+        oldest = db.select(GeminiCache.key).order_by(GeminiCache.created_at).limit(overflow)
+        GeminiCache.query.filter(GeminiCache.key.in_(oldest)).delete(synchronize_session=False)
+
+def call_model(client, prompt):
+    start = time.perf_counter()
+    text = client.generate_content(prompt).text
+    return text, time.perf_counter() - start
+
+def generate_texts(prompts, client=None, on_text=None):
+    # on_text(index, text) is called as each prompt's answer becomes available
+    client = client or get_model()
+    keys = [prompt_cache_key(p) for p in prompts]
+    cutoff = datetime.now() - GEMINI_CACHE_TTL
+    texts = {row.key: row.response for row in GeminiCache.query.filter(GeminiCache.key.in_(keys), GeminiCache.created_at >= cutoff)}
+    if on_text:
+        for i, k in enumerate(keys):
+            if k in texts:
+                on_text(i, texts[k])
+    missing = {k: p for k, p in zip(keys, prompts) if k not in texts}
+    if missing:
+        futures = {gemini_executor.submit(call_model, client, p): k for k, p in missing.items()}
+        for future in as_completed(futures):
+            k = futures[future]
+            texts[k], seconds = future.result()
+            record_gemini_call(seconds)
+            db.session.merge(GeminiCache(key=k, prompt=missing[k], response=texts[k], created_at=datetime.now()))
+            if on_text:
+                for i, key in enumerate(keys):
+                    if key == k:
+                        on_text(i, texts[k])
+        db.session.flush()
+        evict_gemini_cache()
+        db.session.commit()
+    return [texts[k] for k in keys]
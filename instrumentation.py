@@ -0,0 +1,209 @@
+import cProfile
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import Counter
+from flask import Blueprint, Response, current_app, g, has_request_context, request, before_render_template, template_rendered
+from sqlalchemy import event
+from models import db
+
+# Per-request instrumentation, enabled with INSTRUMENTATION=1. Each request records wall
+# time, SQL query count and duration, and template render time. The numbers go out as a
+# Server-Timing header and a JSON log line, and are aggregated into per-route histograms
+# served in Prometheus text format at /_metrics. Gemini runs on the repair workers, not in
+# requests, so its call latency gets a histogram of its own there. A sampled fraction
+# of requests can run under cProfile; slow ones are dumped as .prof files, which
+# flameprof or snakeviz turn into flame graphs.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+logger = logging.getLogger('ecoextend.requests')
+bp = Blueprint('instrumentation', __name__)
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+                return
+        self.counts[-1] += 1
+
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = {}  # route -> Histogram of request seconds
+        self.queries = Counter()  # route -> SQL queries
+        self.query_seconds = Counter()  # route -> SQL seconds
+        self.template_seconds = Counter()  # route -> template seconds
+        self.query_warnings = Counter()  # (route, kind) -> requests flagged
+        self.gemini = Histogram()
+
+    def record_request(self, route, stats):
+        with self.lock:
+            self.requests.setdefault(route, Histogram()).observe(stats['seconds'])
+            self.queries[route] += stats['queries']
+            self.query_seconds[route] += stats['query_seconds']
+            self.template_seconds[route] += stats['template_seconds']
+            for kind in {warning['kind'] for warning in stats['warnings']}:
+                self.query_warnings[(route, kind)] += 1
+
+    def record_gemini(self, seconds):
+        with self.lock:
+            self.gemini.observe(seconds)
+
+    def render(self):
+        lines = []
+        with self.lock:
+            lines += ['# HELP ecoextend_request_duration_seconds Request wall time per route.',
+                      '# TYPE ecoextend_request_duration_seconds histogram']
+            for route, histogram in sorted(self.requests.items()):
+                lines += histogram_lines('ecoextend_request_duration_seconds', histogram, f'route="{route}"')
+            for name, help_text, values in (
+                ('ecoextend_sql_queries_total', 'SQL statements executed per route.', self.queries),
+                ('ecoextend_sql_seconds_total', 'Time spent in SQL per route.', self.query_seconds),
+                ('ecoextend_template_seconds_total', 'Time spent rendering templates per route.', self.template_seconds),
+            ):
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+                lines += [f'{name}{{route="{route}"}} {value}' for route, value in sorted(values.items())]
+            lines += ['# HELP ecoextend_sql_warnings_total Requests flagged for redundant or N+1 queries.',
+                      '# TYPE ecoextend_sql_warnings_total counter']
+            lines += [f'ecoextend_sql_warnings_total{{route="{route}",kind="{kind}"}} {value}'
+                      for (route, kind), value in sorted(self.query_warnings.items())]
+            lines += ['# HELP ecoextend_gemini_call_seconds Gemini generate_content latency.',
+                      '# TYPE ecoextend_gemini_call_seconds histogram']
+            lines += histogram_lines('ecoextend_gemini_call_seconds', self.gemini)
+        return '\n'.join(lines) + '\n'
+
+def histogram_lines(name, histogram, labels=''):
+    lines = []
+    cumulative = 0
+    prefix = labels + ',' if labels else ''
+    for bound, count in zip(BUCKETS + ('+Inf',), histogram.counts):
+        cumulative += count
+        lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+    suffix = f'{{{labels}}}' if labels else ''
+    lines.append(f'{name}_sum{suffix} {histogram.sum}')
+    lines.append(f'{name}_count{suffix} {histogram.count}')
+    return lines
+
+metrics = Metrics()
+
+def record_gemini_call(seconds):
+    # Called from gemini.generate_texts on the repair workers, outside any request
+    metrics.record_gemini(seconds)
+
+@bp.route('/_metrics')
+def prometheus_metrics():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+def init_instrumentation(app):
+    app.config.setdefault('INSTRUMENTATION_PROFILE_RATE', float(os.getenv('INSTRUMENTATION_PROFILE_RATE', 0)))
+    app.config.setdefault('INSTRUMENTATION_SLOW_MS', float(os.getenv('INSTRUMENTATION_SLOW_MS', 500)))
+    app.config.setdefault('INSTRUMENTATION_PROFILE_DIR', os.getenv('INSTRUMENTATION_PROFILE_DIR', 'profiles'))
+    # The same statement with the same parameters more than once in a request is a redundant
+    # lookup (e.g. get_user() in a view and again in the context processor); the same
+    # statement with many different parameters is the classic N+1
+    app.config.setdefault('INSTRUMENTATION_REPEATED_QUERY_THRESHOLD', 2)
+    app.config.setdefault('INSTRUMENTATION_N_PLUS_ONE_THRESHOLD', 5)
+    app.config.setdefault('INSTRUMENTATION_LOG_LEVEL', os.getenv('INSTRUMENTATION_LOG_LEVEL', 'INFO'))
+
+    # The request lines are INFO, below the default WARNING, so set the level here and log
+    # to stderr unless the deployment already routes this logger somewhere
+    logger.setLevel(app.config['INSTRUMENTATION_LOG_LEVEL'])
+    if not logger.hasHandlers():
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        event.listen(db.engine, 'after_cursor_execute', after_cursor_execute)
+    before_render_template.connect(before_render, app)
+    template_rendered.connect(after_render, app)
+    app.before_request(start_request)
+    app.after_request(finish_request)
+    app.register_blueprint(bp)
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_start'].pop()
+    if has_request_context() and 'instrument' in g:
+        stats = g.instrument
+        stats['queries'] += 1
+        stats['query_seconds'] += elapsed
+        stats['statements'][statement] += 1
+        stats['calls'][(statement, repr(parameters))] += 1
+
+def before_render(sender, template, context, **extra):
+    if 'instrument' in g:
+        g.instrument['render_stack'].append(time.perf_counter())
+
+def after_render(sender, template, context, **extra):
+    if 'instrument' in g and g.instrument['render_stack']:
+        started = g.instrument['render_stack'].pop()
+        if not g.instrument['render_stack']:
+            # Only count outermost renders; fragments rendered inside a page are included in it
+            g.instrument['template_seconds'] += time.perf_counter() - started
+
+def start_request():
+    g.instrument = {
+        'start': time.perf_counter(),
+        'queries': 0,
+        'query_seconds': 0.0,
+        'template_seconds': 0.0,
+        'statements': Counter(),
+        'calls': Counter(),
+        'render_stack': [],
+        'profiler': None,
+    }
+    if random.random() < current_app.config['INSTRUMENTATION_PROFILE_RATE']:
+        g.instrument['profiler'] = cProfile.Profile()
+        g.instrument['profiler'].enable()
+
+def query_warnings(stats, config):
+    warnings = []
+    for (statement, _), count in stats['calls'].items():
+        if count >= config['INSTRUMENTATION_REPEATED_QUERY_THRESHOLD']:
+            warnings.append({'kind': 'repeated', 'count': count, 'statement': ' '.join(statement.split())[:200]})
+    for statement, count in stats['statements'].items():
+        distinct = sum(1 for (s, _) in stats['calls'] if s == statement)
+        if distinct >= config['INSTRUMENTATION_N_PLUS_ONE_THRESHOLD']:
+            warnings.append({'kind': 'n_plus_one', 'count': count, 'statement': ' '.join(statement.split())[:200]})
+    return warnings
+
+def finish_request(response):
+    stats = g.pop('instrument', None)
+    if stats is None:
+        return response
+    elapsed = time.perf_counter() - stats['start']
+    route = request.url_rule.endpoint if request.url_rule else 'unmatched'
+    if stats['profiler']:
+        stats['profiler'].disable()
+        if elapsed * 1000 >= current_app.config['INSTRUMENTATION_SLOW_MS']:
+            profile_dir = current_app.config['INSTRUMENTATION_PROFILE_DIR']
+            os.makedirs(profile_dir, exist_ok=True)
+            stats['profiler'].dump_stats(os.path.join(profile_dir, f'{route}-{int(time.time() * 1000)}.prof'))
+    summary = {
+        'seconds': elapsed,
+        'queries': stats['queries'],
+        'query_seconds': stats['query_seconds'],
+        'template_seconds': stats['template_seconds'],
+        'warnings': query_warnings(stats, current_app.config),
+    }
+    metrics.record_request(route, summary)
+    response.headers.add('Server-Timing', ', '.join([
+        f'app;dur={elapsed * 1000:.2f}',
+        f'db;dur={stats["query_seconds"] * 1000:.2f};desc="{stats["queries"]} queries"',
+        f'tpl;dur={stats["template_seconds"] * 1000:.2f}',
+    ]))
+    logger.info(json.dumps(dict(summary, route=route, method=request.method, path=request.path, status=response.status_code)))
+    return response
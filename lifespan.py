@@ -0,0 +1,49 @@
+import threading
+from cachetools import TTLCache
+from sqlalchemy import event
+from models import app_state, Product
+
+# Lifespan predictions: deterministic, so they can be cached per product and computed
+# for a whole page at once. Entries are dropped when the product row changes.
+LIFESPAN_CONDITION_FACTORS = {'excellent': 1.1, 'like new': 1.1, 'good': 1.0, 'fair': 0.8, 'poor': 0.6, 'broken': 0.4}
+lifespan_cache_lock = threading.Lock()
+
+def lifespan_cache():
+    return app_state('lifespan_cache', lambda: TTLCache(maxsize=10000, ttl=3600))
+
+def lifespan_fingerprint(product):
+    return (product.price, product.age, product.description)
+
+def compute_lifespan(price, age, description):
+    # Price sets the expected total life, age (months) uses it up, and the condition
+    # named in the description scales what is left
+    description = (description or '').lower()
+    factor = next((f for word, f in LIFESPAN_CONDITION_FACTORS.items() if word in description), 1.0)
+    return max(1, int((price / 10 - age / 12) * factor))  # In years
+
+def predict_many(products):
+    lifespans = {}
+    misses = []
+    cache = lifespan_cache()
+    with lifespan_cache_lock:
+        for p in products:
+            cached = cache.get(p.id)
+            if cached and cached[0] == lifespan_fingerprint(p):
+                lifespans[p.id] = cached[1]
+            else:
+                misses.append(p)
+    computed = [compute_lifespan(p.price, p.age, p.description) for p in misses]
+    with lifespan_cache_lock:
+        for p, lifespan in zip(misses, computed):
+            cache[p.id] = (lifespan_fingerprint(p), lifespan)
+            lifespans[p.id] = lifespan
+    return [lifespans[p.id] for p in products]
+
+def predict_lifespan(product):
+    return predict_many([product])[0]
+
+@event.listens_for(Product, 'after_update')
+@event.listens_for(Product, 'after_delete')
+def invalidate_lifespan(mapper, connection, target):
+    with lifespan_cache_lock:
+        lifespan_cache().pop(target.id, None)
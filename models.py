@@ -0,0 +1,148 @@
+import threading
+from datetime import datetime
+from flask import current_app
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.ext.mutable import MutableList
+
+db = SQLAlchemy()
+app_state_lock = threading.Lock()
+
+def app_state(name, factory):
+    # In-process caches and indexes belong to one app and its database, so two apps in
+    # the same process (tests, benchmarks/load.py) never see each other's entries
+    state = current_app.extensions.setdefault('ecoextend', {})
+    if name not in state:
+        with app_state_lock:
+            if name not in state:
+                state[name] = factory()
+    return state[name]
+
+# Models
+class User(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    email = db.Column(db.String(100), unique=True, nullable=False)
+    password = db.Column(db.String(100), nullable=False)  # WARNING: Plaintext; hash in production!
+    # Legacy JSON history; new entries go to the tables below. Move old data with `flask migrate-history`.
+    cart = db.Column(MutableList.as_mutable(db.JSON), default=lambda: [])
+    purchases = db.Column(MutableList.as_mutable(db.JSON), default=lambda: [])
+    repairs = db.Column(MutableList.as_mutable(db.JSON), default=lambda: [])
+    sell_backs = db.Column(MutableList.as_mutable(db.JSON), default=lambda: [])  # Renamed from returns
+    rentals = db.Column(MutableList.as_mutable(db.JSON), default=lambda: [])
+    donations = db.Column(MutableList.as_mutable(db.JSON), default=lambda: [])
+    points = db.Column(db.Integer, default=0)
+
+class Product(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False, index=True)
+    description = db.Column(db.String(200), nullable=False)
+    price = db.Column(db.Float, nullable=False, index=True)
+    image = db.Column(db.String(200), nullable=False)
+    age = db.Column(db.Integer, nullable=False, index=True)  # Age in months
+    sku = db.Column(db.String(64), unique=True, index=True)  # Partner SKU, set by `flask catalog import`
+    __table_args__ = (
+        db.Index('ix_product_name_lower', db.func.lower(name)),  # Case-insensitive name prefix search
+    )
+
+# Single row (id 1) bumped whenever Product rows change, see catalog_cache
+class CatalogVersion(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False)  # UTC
+
+# Per-user history, one row per entry. product_id is a plain column rather than a foreign
+# key because listings can be donated away after they were bought or rented.
+class CartItem(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    product_id = db.Column(db.Integer)
+    name = db.Column(db.String(100), nullable=False)
+    description = db.Column(db.String(200))
+    price = db.Column(db.Float, nullable=False)
+    image = db.Column(db.String(200))
+    lifespan = db.Column(db.Integer)
+
+class Purchase(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    checkout_id = db.Column(db.Integer, db.ForeignKey('checkout.id'), index=True)
+    product_id = db.Column(db.Integer)
+    name = db.Column(db.String(100), nullable=False)
+    description = db.Column(db.String(200))
+    price = db.Column(db.Float, nullable=False)
+    image = db.Column(db.String(200))
+    lifespan = db.Column(db.Integer)
+
+# One row per completed checkout; the unique key makes a resubmitted checkout a no-op
+class Checkout(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    idempotency_key = db.Column(db.String(64), unique=True, nullable=False)
+    total = db.Column(db.Float, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+
+class Rental(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    product_name = db.Column(db.String(100), nullable=False)
+    duration_days = db.Column(db.Integer, nullable=False)
+    cost = db.Column(db.Float, nullable=False)
+    end_date = db.Column(db.String(10))
+
+class RepairRequest(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    product_name = db.Column(db.String(100))
+    condition = db.Column(db.String(200))
+    pickup_date = db.Column(db.String(10))
+    request_date = db.Column(db.String(19))
+    cost_estimate = db.Column(db.Text)
+    repair_shops = db.Column(db.Text)
+    repair_guide = db.Column(db.Text)
+
+class SellBack(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    product_name = db.Column(db.String(100))
+    condition = db.Column(db.String(200))
+    sell_price = db.Column(db.Float)
+    pickup_date = db.Column(db.String(10))
+    date = db.Column(db.String(19))
+
+class Donation(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    product_name = db.Column(db.String(100))
+    condition = db.Column(db.String(200))
+    pickup_date = db.Column(db.String(10))
+    date = db.Column(db.String(19))
+
+# Background generation of a repair request's Gemini texts, see the repair job queue below
+class RepairJob(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    repair_id = db.Column(db.Integer, db.ForeignKey('repair_request.id'), nullable=False, index=True)
+    prompts = db.Column(db.JSON, nullable=False)  # [[RepairRequest field, prompt], ...]
+    status = db.Column(db.String(10), nullable=False, default='pending', index=True)  # pending, running, done, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    next_run_at = db.Column(db.DateTime, nullable=False, default=datetime.now, index=True)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+# Gemini responses keyed on the normalized prompt, shared by every worker
+class GeminiCache(db.Model):
+    key = db.Column(db.String(64), primary_key=True)
+    prompt = db.Column(db.Text, nullable=False)
+    response = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.now, index=True)
+
+# Legacy User JSON column -> history table
+LEGACY_HISTORY = {
+    'cart': CartItem,
+    'purchases': Purchase,
+    'rentals': Rental,
+    'repairs': RepairRequest,
+    'sell_backs': SellBack,
+    'donations': Donation,
+}
@@ -0,0 +1,122 @@
+import bisect
+import threading
+from array import array
+from models import db, app_state, Product
+from catalog_cache import catalog_version
+
+def recommend_products(user_cart, all_products):
+    if not user_cart:
+        return all_products
+    # Simple recommendation: sort by price similarity to average cart price
+    avg_cart_price = sum(item.price for item in user_cart) / len(user_cart) if user_cart else 0
+    sorted_products = sorted(all_products, key=lambda p: abs(p.price - avg_cart_price))
+    return sorted_products
+
+class RecommendationIndex:
+    # Products kept sorted by (price, id) in parallel arrays, so the items closest to a
+    # price come from a binary search plus a two-pointer walk instead of a full sort.
+    def __init__(self):
+        self.lock = threading.RLock()  # Re-entrant so recommend can hold it across nearest and score
+        self.prices = array('d')
+        self.ids = array('q')
+        self.features = {}  # id -> (price, age, name)
+        self.version = None  # Catalog version the index reflects, see catalog_cache
+
+    def build(self, rows, version=None):
+        rows = sorted(rows, key=lambda r: (r.price, r.id))
+        self.prices = array('d', (r.price for r in rows))
+        self.ids = array('q', (r.id for r in rows))
+        self.features = {r.id: (r.price, r.age, r.name) for r in rows}
+        self.version = version
+
+    def follow(self, version):
+        # Our own change moved the catalog to `version`; if anything else changed it in
+        # between, the index is stale and gets rebuilt on next use
+        self.version = version if version is not None and self.version == version - 1 else None
+
+    def add(self, product, version=None):
+        with self.lock:
+            self.follow(version)
+            if product.id in self.features:
+                return
+            pos = bisect.bisect_right(self.prices, product.price)
+            self.prices.insert(pos, product.price)
+            self.ids.insert(pos, product.id)
+            self.features[product.id] = (product.price, product.age, product.name)
+
+    def remove(self, product_id, version=None):
+        with self.lock:
+            self.follow(version)
+            feature = self.features.pop(product_id, None)
+            if feature is None:
+                return
+            pos = bisect.bisect_left(self.prices, feature[0])
+            while self.ids[pos] != product_id:
+                pos += 1
+            del self.prices[pos]
+            del self.ids[pos]
+
+    def nearest(self, target_price, k, skip=0):
+        # Ids ranked by |price - target_price|, ranks skip .. skip + k - 1
+        with self.lock:
+            right = bisect.bisect_left(self.prices, target_price)
+            left = right - 1
+            ranked = []
+            while len(ranked) < skip + k and (left >= 0 or right < len(self.prices)):
+                if right >= len(self.prices) or (left >= 0 and target_price - self.prices[left] <= self.prices[right] - target_price):
+                    ranked.append(self.ids[left])
+                    left -= 1
+                else:
+                    ranked.append(self.ids[right])
+                    right += 1
+            return ranked[skip:]
+
+    def score(self, candidate_ids, user_cart):
+        # Batch similarity against the whole cart: price gap relative to the cart average,
+        # age gap in years and a bonus for items the user already has in the cart by name.
+        # Returns (score, id) pairs; ids no longer in the index are skipped.
+        avg_price = sum(item.price for item in user_cart) / len(user_cart)
+        cart_names = {item.name for item in user_cart}
+        scale = max(avg_price, 1.0)
+        with self.lock:
+            cart_ages = [self.features[item.product_id][1] for item in user_cart if item.product_id in self.features]
+            candidates = [(product_id, self.features.get(product_id)) for product_id in candidate_ids]
+        avg_age = sum(cart_ages) / len(cart_ages) if cart_ages else None
+        scores = []
+        for product_id, feature in candidates:
+            if feature is None:
+                continue
+            price, age, name = feature
+            score = abs(price - avg_price) / scale
+            if avg_age is not None:
+                score += abs(age - avg_age) / 12 * 0.1
+            if name in cart_names:
+                score -= 0.2
+            scores.append((score, product_id))
+        return scores
+
+    def recommend(self, user_cart, k, pool=20):
+        avg_price = sum(item.price for item in user_cart) / len(user_cart)
+        with self.lock:
+            # One critical section, so a concurrent remove or rebuild cannot drop a candidate in between
+            candidates = self.nearest(avg_price, max(k, pool))
+            ranked = sorted(self.score(candidates, user_cart))
+        return [product_id for _, product_id in ranked[:k]]
+
+def recommendation_index():
+    return app_state('recommendation_index', RecommendationIndex)
+
+def get_recommendation_index():
+    # Rebuild when another worker or a bulk import has changed the catalog since this
+    # process last saw it
+    index = recommendation_index()
+    version, _ = catalog_version()
+    if version != index.version:
+        rows = db.session.query(Product.id, Product.price, Product.age, Product.name).all()
+        with index.lock:
+            index.build(rows, version)
+    return index
+
+def products_by_ids(ids):
+    by_id = {p.id: p for p in Product.query.filter(Product.id.in_(ids)).all()} if ids else {}
+    return [by_id[i] for i in ids if i in by_id]
@@ -0,0 +1,177 @@
+import random
+import threading
+from datetime import datetime, timedelta
+from flask import Blueprint, current_app, render_template, request, redirect, url_for, jsonify, abort
+from sqlalchemy import and_, or_, func
+from models import db, app_state, RepairRequest, RepairJob
+from auth import get_user
+from gemini import generate_texts
+
+bp = Blueprint('repair', __name__)
+
+# Repair job queue, stored in the RepairJob table so no broker is needed. Jobs are claimed
+# with a conditional UPDATE, so in-process worker threads and `flask repair-worker`
+# processes can share the queue. Failed jobs are retried with exponential backoff.
+REPAIR_JOB_MAX_ATTEMPTS = 3
+REPAIR_RETRY_BACKOFF = timedelta(seconds=5)
+REPAIR_JOB_TIMEOUT = timedelta(minutes=10)  # Running jobs older than this are taken over
+REPAIR_POLL_INTERVAL = 2.0
+repair_workers_lock = threading.Lock()
+
+def repair_workers():
+    # Worker threads are bound to the app that started them
+    return app_state('repair_workers', list)
+
+def repair_wakeup():
+    return app_state('repair_wakeup', threading.Event)
+
+def claimable_repair_jobs(now):
+    return or_(
+        and_(RepairJob.status == 'pending', RepairJob.next_run_at <= now),
+        and_(RepairJob.status == 'running', RepairJob.started_at < now - REPAIR_JOB_TIMEOUT),
+    )
+
+def claim_repair_job():
+    now = datetime.now()
+    candidate = db.session.query(RepairJob.id).filter(claimable_repair_jobs(now)).order_by(RepairJob.id).first()
+    if not candidate:
+        return None
+    claimed = (RepairJob.query.filter(RepairJob.id == candidate.id, claimable_repair_jobs(now))
+               .update({'status': 'running', 'started_at': now, 'attempts': RepairJob.attempts + 1}, synchronize_session=False))
+    db.session.commit()
+    return db.session.get(RepairJob, candidate.id) if claimed else None
+
+def run_repair_job(job):
+    repair = db.session.get(RepairRequest, job.repair_id)
+    fields = [field for field, _ in job.prompts]
+
+    def store(index, text):
+        # Commit each answer as it arrives so the status endpoint can show partial results
+        setattr(repair, fields[index], text)
+        db.session.commit()
+
+    try:
+        generate_texts([prompt for _, prompt in job.prompts], on_text=store)
+        job.status = 'done'
+        job.error = None
+        job.finished_at = datetime.now()
+    except Exception as e:
+        db.session.rollback()
+        job.error = str(e)[:500]
+        if job.attempts >= REPAIR_JOB_MAX_ATTEMPTS:
+            job.status = 'failed'
+            job.finished_at = datetime.now()
+        else:
+            job.status = 'pending'
+            job.next_run_at = datetime.now() + REPAIR_RETRY_BACKOFF * 2 ** (job.attempts - 1)
+    db.session.commit()
+
+def repair_worker_loop(app, stop=None):
+    stop = stop or threading.Event()
+    with app.app_context():
+        wakeup = repair_wakeup()
+    while not stop.is_set():
+        with app.app_context():
+            try:
+                job = claim_repair_job()
+                if job:
+                    run_repair_job(job)
+                    continue
+            except Exception:
+                # A transient database error (e.g. still locked after busy_timeout) must not
+                # kill the worker; a job it had claimed is taken over after REPAIR_JOB_TIMEOUT
+                db.session.rollback()
+                app.logger.exception('Repair worker failed, retrying in %ss', REPAIR_POLL_INTERVAL)
+                stop.wait(REPAIR_POLL_INTERVAL)
+                continue
+        wakeup.wait(REPAIR_POLL_INTERVAL)
+        wakeup.clear()
+
+def ensure_repair_workers():
+    # REPAIR_WORKERS in-process threads; set it to 0 to rely on `flask repair-worker`
+    app = current_app._get_current_object()
+    workers = repair_workers()
+    with repair_workers_lock:
+        workers[:] = [worker for worker in workers if worker.is_alive()]
+        while len(workers) < app.config['REPAIR_WORKERS']:
+            worker = threading.Thread(target=repair_worker_loop, args=(app,), name=f'repair-worker-{len(workers)}', daemon=True)
+            worker.start()
+            workers.append(worker)
+
+def enqueue_repair_job(repair, prompts):
+    job = RepairJob(repair_id=repair.id, prompts=prompts)
+    db.session.add(job)
+    db.session.commit()
+    ensure_repair_workers()
+    repair_wakeup().set()
+    return job
+
+def repair_queue_metrics():
+    depth = dict(db.session.query(RepairJob.status, func.count(RepairJob.id)).group_by(RepairJob.status).all())
+    recent = (RepairJob.query.filter(RepairJob.status == 'done')
+              .order_by(RepairJob.finished_at.desc()).limit(100).all())
+    latencies = sorted((job.finished_at - job.created_at).total_seconds() for job in recent)
+    return {
+        'depth': depth.get('pending', 0),
+        'running': depth.get('running', 0),
+        'done': depth.get('done', 0),
+        'failed': depth.get('failed', 0),
+        'latency_avg_seconds': sum(latencies) / len(latencies) if latencies else None,
+        'latency_p95_seconds': latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else None,
+    }
+
+@bp.route('/repair', methods=['GET', 'POST'])
+def repair_product():
+    user = get_user()
+    if not user:
+        return redirect(url_for('auth.login'))
+    message = None
+    repair = None
+    if request.method == 'POST':
+        product_name = request.form.get('product_name')
+        condition = request.form.get('condition')
+        location = request.form.get('location')
+        repair_type = request.form.get('repair_type')  # 'diy' or 'professional'
+        # Gemini for repair guide, plus nearest shops and cost estimate for professional repairs
+        prompts = [['repair_guide', f"Step by step guide to repair {condition} on {product_name}"]]
+        if repair_type == 'professional':
+            prompts.append(['repair_shops', f"Nearest repair shops for {product_name} in {location}"])
+            prompts.append(['cost_estimate', f"Estimate repair cost for {condition} on {product_name}"])
+        repair = RepairRequest(
+            user_id=user.id,
+            product_name=product_name,
+            condition=condition,
+            request_date=datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        )
+        # Estimate pickup if professional
+        if repair_type == 'professional':
+            days = random.randint(3, 7)
+            pickup_date = datetime.now() + timedelta(days=days)
+            repair.pickup_date = pickup_date.strftime('%Y-%m-%d')
+            message = f"Estimated pickup: {pickup_date.strftime('%Y-%m-%d')}."
+        db.session.add(repair)
+        db.session.commit()
+        # The texts are generated in the background; the page polls /repair/status/<id>
+        enqueue_repair_job(repair, prompts)
+    return render_template('repair.html', message=message, repair=repair)
+
+@bp.route('/repair/status/<int:repair_id>')
+def repair_status(repair_id):
+    user = get_user()
+    repair = db.session.get(RepairRequest, repair_id)
+    if not user or not repair or repair.user_id != user.id:
+        abort(404)
+    job = RepairJob.query.filter_by(repair_id=repair.id).order_by(RepairJob.id.desc()).first()
+    if job and job.status in ('pending', 'running'):
+        ensure_repair_workers()
+    return jsonify(
+        status=job.status if job else 'done',
+        attempts=job.attempts if job else 0,
+        repair_guide=repair.repair_guide,
+        repair_shops=repair.repair_shops,
+        cost_estimate=repair.cost_estimate,
+    )
+
+@bp.route('/repair/metrics')
+def repair_metrics():
+    return jsonify(repair_queue_metrics())